@@ -3,72 +3,124 @@ import os
 import re
 import sys
 import argparse
+import array
+import bisect
 import concurrent.futures
+import functools
+import multiprocessing
 import signal
 
+try:
+    import re2
+except ImportError:
+    re2 = None
+
 # Handle SIGPIPE so that the script does not error when output is truncated (e.g., piped to head)
 signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
 # Precompiled regular expressions
-TOKENIZE_RE = re.compile(r'\s+|[\w.]+|[^\s\w.]')
-C_STRING_LITERAL_RE = re.compile(r'"(?:\\.|[^"\\])*"')
-PY_STRING_LITERAL_RE = re.compile(
-    r'(?:r|u|ur|ru|f|fr|rf)?(?:"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')',
-    re.IGNORECASE)
-JS_STRING_LITERAL_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
-
-HIGHLIGHT_CANDIDATE_RE = re.compile(r'"(?:\\.|[^"\\])*"')
-FMT_SPEC_RE = re.compile(r'%[-+0# ]*\d*(?:\.\d+)?[dsf]')
-ALPHANUMERIC_RE = re.compile(r'[\w.]+')
+# The number of the group that matched is the kind of the token (see TOKEN_*)
+TOKENIZE_RE = re.compile(r'(\s+)|([\w.]+)|([^\s\w.])')
 SINGLE_PERCENT_S_RE = re.compile(r'%[s]')
-F_STRING_PREFIX_RE = re.compile(r'^(?i:f|fr|rf)')
-STRING_PREFIX_RE = re.compile(r'^(?i:r|u|ur|ru|f|fr|rf)')
+
+def set_regex_engine(engine):
+    """
+    Compile the literal extraction and format specifier patterns with the given engine,
+    're' or 're2' (google-re2, which matches in linear time).
+    These patterns only use syntax that both engines support.
+    """
+    global C_STRING_LITERAL_RE, PY_STRING_LITERAL_RE, JS_STRING_LITERAL_RE, FSTRING_FIELD_RE
+    global HIGHLIGHT_CANDIDATE_RE, FMT_SPEC_RE
+    compile = re2.compile if engine == 're2' else re.compile
+    # Literal patterns capture the quoted literal as "body"; Python additionally captures
+    # an f-string prefix as "fprefix" so that prefixes need not be re-matched afterwards.
+    # They match the undecoded file contents: quotes and backslashes are ASCII,
+    # which never occurs inside a multi-byte UTF-8 sequence.
+    C_STRING_LITERAL_RE = compile(rb'(?P<body>"(?:\\.|[^"\\])*")')
+    PY_STRING_LITERAL_RE = compile(
+        rb'(?:(?P<fprefix>(?i:f|fr|rf))|(?i:r|u|ur|ru))?(?P<body>"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+    JS_STRING_LITERAL_RE = compile(rb'(?P<body>"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+    FSTRING_FIELD_RE = compile(r'\{.*?\}')
+    HIGHLIGHT_CANDIDATE_RE = compile(r'"(?:\\.|[^"\\])*"')
+    FMT_SPEC_RE = compile(r'%[-+0# ]*\d*(?:\.\d+)?[dsf]')
+
+set_regex_engine('re')
+
+# Token kinds
+TOKEN_WHITESPACE = 1
+TOKEN_ALPHANUMERIC = 2
+TOKEN_PUNCTUATION = 3
+
+def _iter_tokens(text):
+    """Lazily yield the (kind, token) pairs of text, for callers that iterate them only once."""
+    return ((m.lastindex, m.group(0)) for m in TOKENIZE_RE.finditer(text))
+
+def tokenize_kind(text):
+    """
+    Tokenize text into whitespace, alphanumeric (including dot) and punctuation tokens,
+    returning (kind, token) pairs where kind is one of the TOKEN_* constants.
+    """
+    return list(_iter_tokens(text))
 
 def tokenize(text):
     """Tokenize text into whitespace, alphanumeric (including dot) and punctuation tokens."""
-    return TOKENIZE_RE.findall(text)
+    return [token for _, token in _iter_tokens(text)]
 
-def extract_c_string_literals(content):
-    """Extract string literals from C/C++ source code."""
+def _read_source(filepath):
+    """
+    Return the undecoded contents of a file, with newlines translated as in text mode.
+    The file is read rather than memory-mapped: a mapped file that shrinks while it is
+    being scanned raises SIGBUS, which would kill the worker process.
+    """
+    with open(filepath, 'rb') as f:
+        content = f.read()
+    if b'\r' in content:
+        content = content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return content
+
+def _build_line_index(content):
+    """Return the sorted offsets of every newline in content."""
+    line_index = array.array('q')
+    start = content.find(b'\n')
+    while start != -1:
+        line_index.append(start)
+        start = content.find(b'\n', start + 1)
+    return line_index
+
+def _extract_literals(pattern, content, line_index):
+    """
+    Extract (line, literal) pairs for every match of a literal pattern in a single pass.
+    content is the undecoded source (see _read_source), and only the literals are decoded.
+    Line numbers are looked up in line_index (see _build_line_index).
+    For f-strings, parts within { ... } are replaced with {}, which candidate_to_regex
+    treats as a wildcard.
+    """
     literals = []
-    for m in C_STRING_LITERAL_RE.finditer(content):
-        line = content.count('\n', 0, m.start()) + 1
+    # re2 reports the group names of bytes patterns as bytes
+    groups = {name if isinstance(name, str) else name.decode(): index
+              for name, index in pattern.groupindex.items()}
+    body = groups['body']
+    fprefix = groups.get('fprefix')
+    for m in pattern.finditer(content):
+        line = bisect.bisect_left(line_index, m.start()) + 1
         # Remove the surrounding quotes
-        literal = m.group(0)[1:-1]
+        literal = m.group(body)[1:-1].decode('utf-8', 'ignore')
+        if fprefix is not None and m.group(fprefix):
+            literal = FSTRING_FIELD_RE.sub('{}', literal)
         literals.append((line, literal))
     return literals
 
-def extract_py_string_literals(content):
+def extract_c_string_literals(content, line_index):
+    """Extract string literals from C/C++ source code."""
+    return _extract_literals(C_STRING_LITERAL_RE, content, line_index)
+
+def extract_py_string_literals(content, line_index):
     """Extract string literals from Python source code."""
-    literals = []
-    for m in PY_STRING_LITERAL_RE.finditer(content):
-        raw_literal = m.group(0)
-        is_f_string = bool(F_STRING_PREFIX_RE.match(raw_literal))
-        # Remove any string prefixes (e.g., r, u, f)
-        literal = STRING_PREFIX_RE.sub('', raw_literal)
-        if (literal.startswith('"') and literal.endswith('"')) or \
-           (literal.startswith("'") and literal.endswith("'")):
-            literal = literal[1:-1]
-        if is_f_string:
-            # For f-strings, remove parts within { ... } (treated as wildcards)
-            parts = re.split(r'\{.*?\}', literal)
-            literal = ' '.join(parts)
-        line = content.count('\n', 0, m.start()) + 1
-        literals.append((line, literal))
-    return literals
+    return _extract_literals(PY_STRING_LITERAL_RE, content, line_index)
 
-def extract_js_string_literals(content):
+def extract_js_string_literals(content, line_index):
     """Extract string literals from JavaScript source code."""
-    literals = []
-    for m in JS_STRING_LITERAL_RE.finditer(content):
-        line = content.count('\n', 0, m.start()) + 1
-        s = m.group(0)
-        if (s.startswith('"') and s.endswith('"')) or (s.startswith("'") and s.endswith("'")):
-            literal = s[1:-1]
-        else:
-            literal = s
-        literals.append((line, literal))
-    return literals
+    return _extract_literals(JS_STRING_LITERAL_RE, content, line_index)
 
 # Map file extensions to the corresponding extractor function
 EXTRACTOR_MAP = {
@@ -81,32 +133,113 @@ EXTRACTOR_MAP = {
     '.jsx': extract_js_string_literals,
 }
 
-def score_candidate(message_tokens, message_tokens_set, candidate_tokens):
+def iter_source_files(directory):
     """
-    Calculate a score for candidate tokens by comparing with message tokens.
-    Format specifiers (e.g., %-06d, %10s) are removed.
+    Recursively yield paths of files under directory that have a supported extension.
+    Symbolic links to directories are not followed, and unreadable directories are skipped.
+    """
+    # Read all entries first so that the directory handle is closed before recursing
+    try:
+        with os.scandir(directory) as it:
+            entries = list(it)
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        if is_dir:
+            yield from iter_source_files(entry.path)
+        elif os.path.splitext(entry.name)[1].lower() in EXTRACTOR_MAP:
+            yield entry.path
+
+def score_candidate(message_positions, candidate_tokens):
+    """
+    Calculate a score for candidate tokens, given as (kind, token) pairs (see tokenize_kind),
+    by comparing with message tokens.
+    message_positions maps each message token to the ascending list of its positions.
+    Format specifiers (e.g., %-06d, %10s) must be removed beforehand (see strip_format_specifiers);
+    tokenize splits '%' off as a token of its own, so a token is never a format specifier.
     Alphanumeric tokens (letters, digits, and dots) contribute 1 point per character,
     and other tokens (whitespace, punctuation) contribute 0.1 point per character.
     The tokens must appear in the same order as in the message.
     """
-    filtered = [token for token in candidate_tokens
-                if token in message_tokens_set and not FMT_SPEC_RE.fullmatch(token)]
-    if not filtered:
-        return 0
+    # Bind the callables used per token to locals
+    get_positions = message_positions.get
+    bisect_right = bisect.bisect_right
+    score = 0.0
     prev_index = -1
-    for token in filtered:
-        try:
-            current_index = message_tokens.index(token, prev_index + 1)
-        except ValueError:
+    any_match = False
+    for kind, token in candidate_tokens:
+        positions = get_positions(token)
+        if not positions:
+            continue
+        # Find the next occurrence of the token after the previous match
+        j = bisect_right(positions, prev_index)
+        if j == len(positions):
             return 0
-        prev_index = current_index
-    score = 0.0
-    for token in filtered:
-        if ALPHANUMERIC_RE.fullmatch(token):
+        prev_index = positions[j]
+        any_match = True
+        if kind == TOKEN_ALPHANUMERIC:
             score += len(token)
         else:
             score += len(token) * 0.1
-    return score
+    return score if any_match else 0
+
+def compile_prefilter(message_tokens, score_threshold):
+    """
+    Compile a pattern that finds any alphanumeric message token in a literal.
+    message_tokens are (kind, token) pairs (see tokenize_kind).
+    A literal without such a token can only score through whitespace and punctuation,
+    so it may be skipped when those tokens of the message cannot reach score_threshold.
+    Return None if no literal can be skipped this way.
+    """
+    alphanumeric = set()
+    other_score = 0.0
+    for kind, token in message_tokens:
+        if kind == TOKEN_ALPHANUMERIC:
+            alphanumeric.add(token)
+        else:
+            other_score += len(token) * 0.1
+    if not alphanumeric or other_score >= score_threshold:
+        return None
+    alternatives = sorted(map(re.escape, alphanumeric), key=len, reverse=True)
+    # Match whole alphanumeric tokens only, the same way TOKENIZE_RE splits them
+    return re.compile(r'(?<![\w.])(?:' + '|'.join(alternatives) + r')(?![\w.])')
+
+def strip_format_specifiers(s):
+    """
+    Remove format specifiers (e.g., %-06d, %10s) from s.
+    This is equivalent to FMT_SPEC_RE.sub('', s), but scans for '%' without the regex engine.
+    """
+    if '%' not in s:
+        return s
+    out = []
+    i = 0
+    n = len(s)
+    while True:
+        j = s.find('%', i)
+        if j < 0:
+            out.append(s[i:])
+            break
+        out.append(s[i:j])
+        k = j + 1
+        while k < n and s[k] in '-+0# ':
+            k += 1
+        while k < n and s[k].isdecimal():
+            k += 1
+        # The precision needs at least one digit after the dot
+        if k + 1 < n and s[k] == '.' and s[k + 1].isdecimal():
+            k += 2
+            while k < n and s[k].isdecimal():
+                k += 1
+        if k < n and s[k] in 'dsf':
+            i = k + 1
+        else:
+            out.append('%')
+            i = j + 1
+    return ''.join(out)
 
 def candidate_to_regex(literal):
     """
@@ -125,50 +258,65 @@ def candidate_to_regex(literal):
     pattern = tmp.replace(re.escape(placeholder), ".*")
     return pattern
 
-def process_file(filepath, message_tokens, message_tokens_set):
-    """Process a single file and return matching string literal candidates."""
+def process_file(filepath, message, message_positions, score_threshold, prefilter=None, debug=False):
+    """
+    Process a single file and return a tuple (candidates, file_lines).
+    file_lines holds the lines of the file for printing context, and is None
+    when there are no candidates so that it is not sent back needlessly.
+    prefilter is the pattern from compile_prefilter, used to skip literals quickly.
+    All settings are passed explicitly so that the function can run in a worker process.
+    """
     results = []
-    try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-    except Exception:
-        return results
-
     ext = os.path.splitext(filepath)[1].lower()
     extractor = EXTRACTOR_MAP.get(ext)
     if extractor is None:
-        if args.debug:
+        if debug:
             print(f"[DEBUG] No extractor for {filepath}", file=sys.stderr)
-        return results
+        return results, None
 
-    literals = extractor(content)
-    if args.debug:
+    try:
+        content = _read_source(filepath)
+    except Exception:
+        return results, None
+
+    literals = extractor(content, _build_line_index(content))
+    if debug:
         print(f"[DEBUG] Processing file: {filepath} with extractor: {extractor.__name__}, found {len(literals)} literals.", file=sys.stderr)
     for line, literal in literals:
+        # スコア算出には、元の処理と同様にフォーマット指定子を一旦除去して token 化
+        clean_literal = strip_format_specifiers(literal)
+        if prefilter is not None and not prefilter.search(clean_literal):
+            if debug:
+                print(f"[DEBUG] Literal shares no word with message: {literal}", file=sys.stderr)
+            continue
+
         # 既存のフォーマット指定子除去処理ではなく、候補文字列のフォーマット指定子を .* に置換した正規表現パターンに変換
         pattern = candidate_to_regex(literal)
-        if not re.search(pattern, args.message):
-            if args.debug:
+        if not re.search(pattern, message):
+            if debug:
                 print(f"[DEBUG] Literal does not match message: {literal}", file=sys.stderr)
             continue
 
-        # スコア算出には、元の処理と同様にフォーマット指定子を一旦除去して token 化
-        clean_literal = FMT_SPEC_RE.sub('', literal)
-        cand_tokens = tokenize(clean_literal)
-        if args.debug:
+        if debug:
             print(f"[DEBUG] File: {filepath} (line {line}):", file=sys.stderr)
             print(f"        Original literal: {literal}", file=sys.stderr)
             print(f"        Pattern: {pattern}", file=sys.stderr)
             print(f"        Clean literal: {clean_literal}", file=sys.stderr)
-            print(f"        Candidate tokens: {cand_tokens}", file=sys.stderr)
-        if not cand_tokens:
+            print(f"        Candidate tokens: {tokenize(clean_literal)}", file=sys.stderr)
+        # Every character belongs to some token, so these checks can be made on the literal itself
+        if not clean_literal:
             continue
-        if len(cand_tokens) == 1 and SINGLE_PERCENT_S_RE.fullmatch(cand_tokens[0]):
+        if SINGLE_PERCENT_S_RE.fullmatch(clean_literal):
             continue
-        score_val = score_candidate(message_tokens, message_tokens_set, cand_tokens)
-        if args.debug:
+        # A literal of letters, digits and dots only is a single token ([\w.]+ without '_')
+        if clean_literal.replace('.', '').isalnum():
+            cand_tokens = ((TOKEN_ALPHANUMERIC, clean_literal),)
+        else:
+            cand_tokens = _iter_tokens(clean_literal)
+        score_val = score_candidate(message_positions, cand_tokens)
+        if debug:
             print(f"[DEBUG] Score for literal on line {line}: {score_val}", file=sys.stderr)
-        if score_val >= args.score:
+        if score_val >= score_threshold:
             results.append({
                 'type': 'string',
                 'line': line,
@@ -176,18 +324,71 @@ def process_file(filepath, message_tokens, message_tokens_set):
                 'score': score_val,
                 'file': filepath
             })
-    return results
-
-def highlight_text(text, tokens):
-    """Highlight occurrences of tokens in text using ANSI color codes."""
-    for token in tokens:
-        if token:
-            if ALPHANUMERIC_RE.fullmatch(token):
-                pattern = r'\b' + re.escape(token) + r'\b'
-            else:
-                pattern = re.escape(token)
-            text = re.sub(pattern, lambda m: "\033[31m" + m.group(0) + "\033[0m", text)
-    return text
+    if not results:
+        return results, None
+    # Split on '\n' only, so that lines agree with the line numbers of the candidates
+    file_lines = str(content, 'utf-8', 'ignore').split('\n')
+    if file_lines[-1] == '':
+        file_lines.pop()
+    return results, file_lines
+
+# Keyword arguments for process_file, set once per worker process by _init_worker
+_worker_settings = None
+
+def _init_worker(engine, settings):
+    """Initialize a worker process with the regex engine and the settings for process_file."""
+    global _worker_settings
+    set_regex_engine(engine)
+    _worker_settings = settings
+
+def _process_file_in_worker(filepath):
+    """Run process_file with the settings given to _init_worker."""
+    return process_file(filepath, **_worker_settings)
+
+def _terminate_pool(executor):
+    """Shut down a process pool without waiting for running tasks, and terminate its workers."""
+    executor.shutdown(wait=False, cancel_futures=True)
+    workers = multiprocessing.active_children()
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join()
+
+# ANSI color codes for highlighting
+_RED_OPEN = "\033[31m"
+_RED_CLOSE = "\033[0m"
+
+def _red_wrap(m):
+    """Return the matched text wrapped in ANSI color codes."""
+    return _RED_OPEN + m.group(0) + _RED_CLOSE
+
+def compile_highlight_pattern(tokens):
+    """
+    Compile a single pattern matching any of the tokens, given as (kind, token) pairs
+    (see tokenize_kind). Alphanumeric tokens only match at word boundaries.
+    Return None if there are no tokens.
+    """
+    alphanumeric = set()
+    other = set()
+    for kind, token in tokens:
+        if kind == TOKEN_ALPHANUMERIC:
+            alphanumeric.add(re.escape(token))
+        else:
+            other.add(re.escape(token))
+    # Longer alternatives first so that a token is not cut short by its own prefix
+    alternatives = []
+    if alphanumeric:
+        alternatives.append(r'\b(?:' + '|'.join(sorted(alphanumeric, key=len, reverse=True)) + r')\b')
+    alternatives.extend(sorted(other, key=len, reverse=True))
+    if not alternatives:
+        return None
+    return re.compile('|'.join(alternatives))
+
+def highlight_text(text, highlight_pattern):
+    """Highlight matches of the compiled highlight pattern in text using ANSI color codes."""
+    if highlight_pattern is None:
+        return text
+    return highlight_pattern.sub(_red_wrap, text)
 
 def highlight_candidate_in_line(line, candidate_content):
     """
@@ -198,18 +399,24 @@ def highlight_candidate_in_line(line, candidate_content):
     def repl(m):
         s = m.group(0)
         inner = s[1:-1]
-        cleaned = FMT_SPEC_RE.sub('', inner)
+        cleaned = strip_format_specifiers(inner)
         if cleaned == candidate_content:
-            return '"' + "\033[31m" + inner + "\033[0m" + '"'
+            return '"' + _RED_OPEN + inner + _RED_CLOSE + '"'
         else:
             return s
     return HIGHLIGHT_CANDIDATE_RE.sub(repl, line, count=1)
 
-def print_with_context(candidate, context_before, context_after, print_line_numbers, file_lines, use_color, with_filename):
+def print_with_context(candidate, context_before, context_after, print_line_numbers, file_lines, use_color, with_filename, separator, highlight_pattern):
     """
     Print the matching candidate with optional context lines.
-    If -H/--with-filename is specified, each matching line is prefixed with the file name.
+    If -H/--with-filename is specified, each matching line is prefixed with the file name
+    instead of printing a summary line for the candidate.
+    If separator is true, a separator line is printed after the candidate.
+    The output for the candidate is collected and written at once.
     """
+    buf = []
+    if not with_filename:
+        buf.append(f"File: {candidate['file']}  Line: {candidate['line']}  Type: {candidate['type']}  Score: {candidate['score']:.1f}\n")
     match_line_index = candidate['line'] - 1
     start_index = max(0, match_line_index - context_before)
     end_index = min(len(file_lines), match_line_index + context_after + 1)
@@ -219,7 +426,7 @@ def print_with_context(candidate, context_before, context_after, print_line_numb
             if i == match_line_index and candidate['type'] == 'string':
                 line_text = highlight_candidate_in_line(line_text, candidate['content'])
             else:
-                line_text = highlight_text(line_text, tokenize(args.message))
+                line_text = highlight_text(line_text, highlight_pattern)
         if with_filename:
             if print_line_numbers:
                 prefix = f"{candidate['file']}:{i+1}:"
@@ -230,10 +437,10 @@ def print_with_context(candidate, context_before, context_after, print_line_numb
         else:
             prefix = ""
         marker = " <== match" if i == match_line_index else ""
-        print(f"{prefix}{line_text}{marker}")
-    # Only print separator if any context options are specified
-    if args.A != 0 or args.B != 0 or args.C is not None:
-        print("-" * 40)
+        buf.append(f"{prefix}{line_text}{marker}\n")
+    if separator:
+        buf.append("-" * 40 + "\n")
+    sys.stdout.write(''.join(buf))
 
 def main():
     parser = argparse.ArgumentParser(
@@ -251,8 +458,9 @@ def main():
     parser.add_argument("--score", type=float, default=1, help="Minimum score threshold for a candidate")
     parser.add_argument("--sort", action="store_true", help="Sort candidates by score (highest first)")
     parser.add_argument("-H", "--with-filename", action="store_true", help="Display filename on each matching line (suppress candidate summary)")
+    parser.add_argument("--engine", choices=("auto", "re", "re2"), default="auto",
+                        help="Regular expression engine for extracting literals (default: re2 if installed, otherwise re)")
     parser.add_argument("--debug", action="store_true", help="Enable debug output")
-    global args
     args = parser.parse_args()
 
     if args.C is not None:
@@ -261,54 +469,94 @@ def main():
         if args.B == 0:
             args.B = args.C
 
+    engine = args.engine
+    if engine == "auto":
+        engine = "re" if re2 is None else "re2"
+    elif engine == "re2" and re2 is None:
+        parser.error("--engine re2 requires the google-re2 package")
+    set_regex_engine(engine)
+    if args.debug:
+        print(f"[DEBUG] Regular expression engine: {engine}", file=sys.stderr)
+
     use_color = sys.stdout.isatty()
     if args.color:
         use_color = True
     if args.nocolor:
         use_color = False
 
-    message_tokens = tokenize(args.message)
+    message_token_kinds = tokenize_kind(args.message)
+    message_tokens = [token for _, token in message_token_kinds]
     if args.debug:
         print(f"[DEBUG] Tokenized message: {message_tokens}", file=sys.stderr)
-    message_tokens_set = set(message_tokens)
-    candidates = []
-    file_paths = []
-    for root, _, files in os.walk(args.directory):
-        for file in files:
-            if file.endswith(('.c', '.h', '.cpp', '.cc', '.py', '.js', '.jsx')):
-                file_paths.append(os.path.join(root, file))
+    message_positions = {}
+    for i, token in enumerate(message_tokens):
+        message_positions.setdefault(token, []).append(i)
+    file_paths = list(iter_source_files(args.directory))
     if args.debug:
         print(f"[DEBUG] Found {len(file_paths)} candidate files.", file=sys.stderr)
 
+    # Only print separator if any context options are specified
+    separator = args.A != 0 or args.B != 0 or args.C is not None
+    emit = functools.partial(
+        print_with_context,
+        context_before=args.B,
+        context_after=args.A,
+        print_line_numbers=args.n,
+        use_color=use_color,
+        with_filename=args.with_filename,
+        separator=separator,
+        highlight_pattern=compile_highlight_pattern(message_token_kinds))
+
+    # The scan is CPU-bound, so use processes rather than threads to avoid the GIL
     max_workers = os.cpu_count() or 1
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_path = {executor.submit(process_file, path, message_tokens, message_tokens_set): path for path in file_paths}
-        for future in concurrent.futures.as_completed(future_to_path):
-            result = future.result()
-            if result:
+    # The settings are sent to each worker once, so that dispatching a batch of files
+    # only has to pickle the file paths
+    settings = {
+        'message': args.message,
+        'message_positions': message_positions,
+        'score_threshold': args.score,
+        'prefilter': compile_prefilter(message_token_kinds, args.score),
+        'debug': args.debug,
+    }
+    chunksize = min(64, max(1, len(file_paths) // (max_workers * 4)))
+    # Without --sort, candidates are printed as soon as each file has been processed
+    candidates = []
+    file_cache = {}
+    total = 0
+    # While the pool is running, a closed output must not kill msgp through SIGPIPE:
+    # the workers would be left behind, blocked on writing their results.
+    # Ignore it so that writing raises BrokenPipeError and the workers can be terminated.
+    previous_sigpipe = signal.signal(signal.SIGPIPE, signal.SIG_IGN)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(engine, settings))
+    try:
+        for result, file_lines in executor.map(_process_file_in_worker, file_paths, chunksize=chunksize):
+            if not result:
+                continue
+            total += len(result)
+            if args.sort:
                 candidates.extend(result)
+                file_cache[result[0]['file']] = file_lines
+            else:
+                for cand in result:
+                    emit(cand, file_lines=file_lines)
+    except BaseException:
+        _terminate_pool(executor)
+        raise
+    finally:
+        signal.signal(signal.SIGPIPE, previous_sigpipe)
+    executor.shutdown()
 
-    candidates = [cand for cand in candidates if cand['score'] >= args.score]
     if args.sort:
         candidates.sort(key=lambda x: x['score'], reverse=True)
+        for cand in candidates:
+            emit(cand, file_lines=file_cache[cand['file']])
     if args.debug:
-        print(f"[DEBUG] Total candidates found: {len(candidates)}", file=sys.stderr)
-
-    file_cache = {}
-    for cand in candidates:
-        if not args.with_filename:
-            print(f"File: {cand['file']}  Line: {cand['line']}  Type: {cand['type']}  Score: {cand['score']:.1f}")
-        if cand['file'] not in file_cache:
-            try:
-                with open(cand['file'], 'r', encoding='utf-8', errors='ignore') as f:
-                    file_cache[cand['file']] = f.readlines()
-            except Exception:
-                file_cache[cand['file']] = []
-        file_lines = file_cache[cand['file']]
-        print_with_context(cand, args.B, args.A, args.n, file_lines, use_color, args.with_filename)
+        print(f"[DEBUG] Total candidates found: {total}", file=sys.stderr)
 
 if __name__ == "__main__":
     try:
         main()
     except BrokenPipeError:
+        # Python flushes stdout on exit, which would fail again on the closed pipe
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
         sys.exit(0)
@@ -2,9 +2,14 @@
 import os
 import shutil
 import subprocess
+import sys
 import tempfile
+import time
 import unittest
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import msgp
+
 class TestMsgpFormatSpecifiers(unittest.TestCase):
 
     def setUp(self):
@@ -76,5 +81,55 @@ console.log("min: %s swap peak: %d");
         output = self.run_msgp("Memory: 20.8G (min: 250M peak: 27G swap: 2.7G swap peak: 6.7G)", additional_args=["--score", "1"])
         self.assertIn("console.log", output, msg="JavaScript file candidate did not contain 'swap peak'.")
 
+    def test_python_prefixed_string_literals(self):
+        """Test that rf/fr-prefixed Python literals are extracted, with f-string fields as wildcards."""
+        with open(os.path.join(self.test_dir, "prefix_test.py"), "w", encoding="utf-8") as f:
+            f.write('''
+def load(name):
+    print(rf"config directory C:\\temp is not writable")
+    print(fr'cannot open {name!r} for reading')
+''')
+        output = self.run_msgp("error: config directory C:\\temp is not writable", additional_args=["--nocolor"])
+        self.assertIn('rf"config directory', output, msg="rf-prefixed literal was not found.")
+        output = self.run_msgp("error: cannot open 'settings.ini' for reading", additional_args=["--nocolor"])
+        self.assertIn("fr'cannot open", output, msg="fr-prefixed literal with a field was not found.")
+
+    def test_crlf_line_numbers(self):
+        """Test that line numbers and context lines are correct for a file with CRLF line endings."""
+        with open(os.path.join(self.test_dir, "crlf_test.c"), "wb") as f:
+            f.write(b'#include <stdio.h>\r\n\r\nint main() {\r\n    puts("disk quota exceeded");\r\n}\r\n')
+        output = self.run_msgp("error: disk quota exceeded", additional_args=["--nocolor", "-n", "-B", "1"])
+        self.assertIn("Line: 4 ", output)
+        self.assertIn('3:int main() {\n4:    puts("disk quota exceeded"); <== match\n', output)
+
+    def test_closed_output_leaves_no_workers(self):
+        """Test that no worker process survives when the reader of the output exits early."""
+        # Enough output to fill the pipe while files are still being scanned
+        for i in range(200):
+            with open(os.path.join(self.test_dir, f"many_{i}.c"), "w", encoding="utf-8") as f:
+                f.write('puts("cannot open file");\n' * 50)
+        cmd = [self.msgp_script, "error: cannot open file", self.test_dir, "--nocolor"]
+        # Run msgp in its own process group, which its worker processes join as well
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, start_new_session=True)
+        proc.stdout.readline()
+        proc.stdout.close()
+        proc.wait(timeout=30)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                os.killpg(proc.pid, 0)
+            except ProcessLookupError:
+                break
+            if time.monotonic() > deadline:
+                os.killpg(proc.pid, 9)
+                self.fail("A worker process was left running after the output was closed.")
+            time.sleep(0.1)
+
+    def test_strip_format_specifiers(self):
+        """Test that format specifiers are removed the same way as with FMT_SPEC_RE."""
+        for literal in ["min: %s swap peak: %d", "%-06d|%10s|%.2f|%+5.1f", "100%", "%5.d", "%%d", "no specifiers"]:
+            self.assertEqual(msgp.strip_format_specifiers(literal), msgp.FMT_SPEC_RE.sub('', literal), msg=literal)
+        self.assertEqual(msgp.strip_format_specifiers("min: %s swap peak: %-06d"), "min:  swap peak: ")
+
 if __name__ == '__main__':
     unittest.main()